@@ -0,0 +1,58 @@
+'''
+Measures how long it takes to parse a FindItem response.
+
+Usage:
+    python benchmarks/parse.py [numItems]
+
+Prints the parse time per 1000 CalendarItems for a synthetic response with numItems items.
+The items start on the half hour, like most meetings, so many time strings repeat.
+'''
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gs_exchange_interface
+
+CAL_ITEM = '''<t:CalendarItem>
+    <t:ItemId Id="AAMkAD{i:08d}" ChangeKey="DwAAAB{i:08d}"/>
+    <t:Subject>Meeting {i}</t:Subject>
+    <t:Body BodyType="HTML">&lt;html&gt;&lt;body&gt;Agenda {i}&lt;/body&gt;&lt;/html&gt;</t:Body>
+    <t:HasAttachments>false</t:HasAttachments>
+    <t:Size>4096</t:Size>
+    <t:Start>{start}</t:Start>
+    <t:End>{end}</t:End>
+    <t:Organizer><t:Mailbox><t:Name>Organizer {i}</t:Name></t:Mailbox></t:Organizer>
+</t:CalendarItem>'''
+
+
+def MakeResponse(numItems):
+    base = datetime.datetime(2026, 1, 5, 8, 0)
+    items = []
+    for i in range(numItems):
+        start = base + datetime.timedelta(days=i // 16, minutes=30 * (i % 16))
+        end = start + datetime.timedelta(minutes=30)
+        items.append(CAL_ITEM.format(
+            i=i,
+            start=start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            end=end.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        ))
+    return '<m:Items>{}</m:Items>'.format(''.join(items))
+
+
+if __name__ == '__main__':
+    numItems = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    response = MakeResponse(numItems)
+    ews = gs_exchange_interface.EWS(username='user@example.com', password='password')
+
+    def Parse():
+        # measure a full parse, not the reuse of unchanged items or time strings from the last parse
+        ews._calItemCache = {}
+        getattr(gs_exchange_interface, '_timeStringCache', {}).clear()
+        ews._CreateCalendarItemsFromResponse(response)
+
+    number = 10
+    best = min(timeit.repeat(Parse, number=number, repeat=5)) / number
+    print('{} items: {:.2f}ms per 1000 items'.format(numItems, best / numItems * 1000 * 1000))
@@ -0,0 +1,65 @@
+'''
+Replays an archive recorded with EWS.StartCapture and measures where the time goes.
+
+Usage:
+    python benchmarks/replay.py capture.ndjson.gz [--no-timing]
+
+Every recorded FindItem response is fed through EWS.UpdateCalendar, with its default window like a
+polling controller, and with the recorded request time added back in (unless --no-timing). Run the
+same archive against two versions of this module to compare them on a real workload.
+'''
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gs_exchange_interface
+
+
+def CountOperations(path):
+    # returns a dict like {operation: count}
+    ret = {}
+    for record in gs_exchange_interface.ReadCapture(path):
+        ret[record['operation']] = ret.get(record['operation'], 0) + 1
+    return ret
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    realTiming = '--no-timing' not in sys.argv
+
+    operations = CountOperations(path)
+    print('operations:', operations)
+
+    ews = gs_exchange_interface.EWS(username='replay@example.com', password='replay')
+    ews.StartReplay(path, realTiming=realTiming)
+
+    # count the responses that are actually parsed, unchanged responses should skip RegisterCalendarItems
+    numRegistered = [0]
+    registerCalendarItems = ews.RegisterCalendarItems
+
+    def CountingRegisterCalendarItems(*a, **k):
+        numRegistered[0] += 1
+        return registerCalendarItems(*a, **k)
+
+    ews.RegisterCalendarItems = CountingRegisterCalendarItems
+
+    numUpdates = operations.get('FindItem', 0)
+    networkTime = 0
+    startTime = time.perf_counter()
+    for _ in range(numUpdates):
+        resp = ews.UpdateCalendar()
+        networkTime += resp.elapsed.total_seconds() if realTiming else 0
+    totalTime = time.perf_counter() - startTime
+
+    print('{} UpdateCalendar calls in {:.1f}ms'.format(numUpdates, totalTime * 1000))
+    print('    {} responses parsed, {} unchanged responses skipped'.format(
+        numRegistered[0],
+        numUpdates - numRegistered[0],
+    ))
+    print('    recorded request time: {:.1f}ms'.format(networkTime * 1000))
+    print('    processing time: {:.1f}ms ({:.2f}ms per call)'.format(
+        (totalTime - networkTime) * 1000,
+        (totalTime - networkTime) * 1000 / max(numUpdates, 1),
+    ))
@@ -0,0 +1,67 @@
+'''
+Measures the cold start of gs_exchange_interface.
+
+Usage:
+    python benchmarks/startup.py [numRooms]
+
+Prints the slowest imports (from "python -X importtime") and how long it takes to
+restore numRooms room interfaces with ServiceAccount.LoadRoomInterfaces.
+'''
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def ImportTimes():
+    # returns a list of (cumulativeMicroseconds, moduleName) for a fresh interpreter importing the module
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import gs_exchange_interface'],
+        cwd=REPO_DIR,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    ret = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        ret.append((int(cumulative), name.rstrip()))
+    return ret
+
+
+def LoadTime(numRooms):
+    # returns the seconds to restore numRooms room interfaces, in a fresh interpreter
+    code = '''
+import time
+t = time.perf_counter()
+import gs_exchange_interface
+sa = gs_exchange_interface.ServiceAccount(email='service@example.com', password='password')
+s = gs_exchange_interface.ServiceAccount.Dumper(sa)
+gs_exchange_interface.ServiceAccount.LoadRoomInterfaces(
+    (s, 'room{}@example.com'.format(i)) for i in range({numRooms})
+)
+print(time.perf_counter() - t)
+'''.replace('{numRooms}', str(numRooms))
+    proc = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=REPO_DIR,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    numRooms = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    times = ImportTimes()
+    total = next(cumulative for cumulative, name in times if name.strip() == 'gs_exchange_interface')
+    print('import gs_exchange_interface: {:.1f}ms'.format(total / 1000))
+    print('slowest imports (cumulative):')
+    for cumulative, name in sorted(times, reverse=True)[:15]:
+        print('    {:8.1f}ms {}'.format(cumulative / 1000, name))
+
+    print('import + restore {} room interfaces: {:.1f}ms'.format(numRooms, LoadTime(numRooms) * 1000))
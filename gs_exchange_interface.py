@@ -2,37 +2,618 @@
 All datetimes that are passed to/from this module are in the system local time.
 
 '''
+import bisect
 import datetime
+import hashlib
+import io
 import json
+import os
 import re
-from base64 import b64decode
+from base64 import b64decode, b64encode
 
 import time
+import zlib
 
 from gs_service_accounts import _ServiceAccountBase
 
-try:
-    from extronlib.system import ProgramLog
-    import gs_requests as requests
-except Exception as e:
-    print(str(e))
-    import requests
-
 from gs_calendar_base import (
     _BaseCalendar,
     _CalendarItem,
     ConvertDatetimeToTimeString,
     ConvertTimeStringToDatetime
 )
-import gs_oauth_tools
-
-TZ_NAME = time.tzname[0]
-if TZ_NAME == 'EST':
-    TZ_NAME = 'Eastern Standard Time'
-elif TZ_NAME == 'PST':
-    TZ_NAME = 'Pacific Standard Time'
-elif TZ_NAME == 'CST':
-    TZ_NAME = 'Central Standard Time'
+
+# Modules that are slow to import (requests, multiprocessing) are imported where they are first used,
+# so that importing this module and restoring ServiceAccounts is fast on a cold start.
+requests = None  # see _ImportRequests
+
+
+def _ImportRequests():
+    global requests
+    if requests is None:
+        try:
+            from extronlib.system import ProgramLog
+            import gs_requests as requests
+        except Exception as e:
+            print(str(e))
+            import requests
+    return requests
+
+
+# Windows timezone names (used by EWS) to the main IANA name, from the CLDR windowsZones.xml "001" territory
+WINDOWS_TO_IANA = {
+    'Dateline Standard Time': 'Etc/GMT+12',
+    'UTC-11': 'Etc/GMT+11',
+    'Aleutian Standard Time': 'America/Adak',
+    'Hawaiian Standard Time': 'Pacific/Honolulu',
+    'Marquesas Standard Time': 'Pacific/Marquesas',
+    'Alaskan Standard Time': 'America/Anchorage',
+    'UTC-09': 'Etc/GMT+9',
+    'Pacific Standard Time (Mexico)': 'America/Tijuana',
+    'UTC-08': 'Etc/GMT+8',
+    'Pacific Standard Time': 'America/Los_Angeles',
+    'US Mountain Standard Time': 'America/Phoenix',
+    'Mountain Standard Time (Mexico)': 'America/Mazatlan',
+    'Mountain Standard Time': 'America/Denver',
+    'Yukon Standard Time': 'America/Whitehorse',
+    'Central America Standard Time': 'America/Guatemala',
+    'Central Standard Time': 'America/Chicago',
+    'Easter Island Standard Time': 'Pacific/Easter',
+    'Central Standard Time (Mexico)': 'America/Mexico_City',
+    'Canada Central Standard Time': 'America/Regina',
+    'SA Pacific Standard Time': 'America/Bogota',
+    'Eastern Standard Time (Mexico)': 'America/Cancun',
+    'Eastern Standard Time': 'America/New_York',
+    'Haiti Standard Time': 'America/Port-au-Prince',
+    'Cuba Standard Time': 'America/Havana',
+    'US Eastern Standard Time': 'America/Indiana/Indianapolis',
+    'Turks And Caicos Standard Time': 'America/Grand_Turk',
+    'Paraguay Standard Time': 'America/Asuncion',
+    'Atlantic Standard Time': 'America/Halifax',
+    'Venezuela Standard Time': 'America/Caracas',
+    'Central Brazilian Standard Time': 'America/Cuiaba',
+    'SA Western Standard Time': 'America/La_Paz',
+    'Pacific SA Standard Time': 'America/Santiago',
+    'Newfoundland Standard Time': 'America/St_Johns',
+    'Tocantins Standard Time': 'America/Araguaina',
+    'E. South America Standard Time': 'America/Sao_Paulo',
+    'SA Eastern Standard Time': 'America/Cayenne',
+    'Argentina Standard Time': 'America/Argentina/Buenos_Aires',
+    'Greenland Standard Time': 'America/Nuuk',
+    'Montevideo Standard Time': 'America/Montevideo',
+    'Magallanes Standard Time': 'America/Punta_Arenas',
+    'Saint Pierre Standard Time': 'America/Miquelon',
+    'Bahia Standard Time': 'America/Bahia',
+    'UTC-02': 'Etc/GMT+2',
+    'Azores Standard Time': 'Atlantic/Azores',
+    'Cape Verde Standard Time': 'Atlantic/Cape_Verde',
+    'UTC': 'Etc/UTC',
+    'GMT Standard Time': 'Europe/London',
+    'Greenwich Standard Time': 'Atlantic/Reykjavik',
+    'Sao Tome Standard Time': 'Africa/Sao_Tome',
+    'Morocco Standard Time': 'Africa/Casablanca',
+    'W. Europe Standard Time': 'Europe/Berlin',
+    'Central Europe Standard Time': 'Europe/Budapest',
+    'Romance Standard Time': 'Europe/Paris',
+    'Central European Standard Time': 'Europe/Warsaw',
+    'W. Central Africa Standard Time': 'Africa/Lagos',
+    'Jordan Standard Time': 'Asia/Amman',
+    'GTB Standard Time': 'Europe/Bucharest',
+    'Middle East Standard Time': 'Asia/Beirut',
+    'Egypt Standard Time': 'Africa/Cairo',
+    'E. Europe Standard Time': 'Europe/Chisinau',
+    'Syria Standard Time': 'Asia/Damascus',
+    'West Bank Standard Time': 'Asia/Hebron',
+    'South Africa Standard Time': 'Africa/Johannesburg',
+    'FLE Standard Time': 'Europe/Kiev',
+    'Israel Standard Time': 'Asia/Jerusalem',
+    'South Sudan Standard Time': 'Africa/Juba',
+    'Kaliningrad Standard Time': 'Europe/Kaliningrad',
+    'Sudan Standard Time': 'Africa/Khartoum',
+    'Libya Standard Time': 'Africa/Tripoli',
+    'Namibia Standard Time': 'Africa/Windhoek',
+    'Arabic Standard Time': 'Asia/Baghdad',
+    'Turkey Standard Time': 'Europe/Istanbul',
+    'Arab Standard Time': 'Asia/Riyadh',
+    'Belarus Standard Time': 'Europe/Minsk',
+    'Russian Standard Time': 'Europe/Moscow',
+    'E. Africa Standard Time': 'Africa/Nairobi',
+    'Volgograd Standard Time': 'Europe/Volgograd',
+    'Iran Standard Time': 'Asia/Tehran',
+    'Arabian Standard Time': 'Asia/Dubai',
+    'Astrakhan Standard Time': 'Europe/Astrakhan',
+    'Azerbaijan Standard Time': 'Asia/Baku',
+    'Russia Time Zone 3': 'Europe/Samara',
+    'Mauritius Standard Time': 'Indian/Mauritius',
+    'Saratov Standard Time': 'Europe/Saratov',
+    'Georgian Standard Time': 'Asia/Tbilisi',
+    'Caucasus Standard Time': 'Asia/Yerevan',
+    'Afghanistan Standard Time': 'Asia/Kabul',
+    'West Asia Standard Time': 'Asia/Tashkent',
+    'Ekaterinburg Standard Time': 'Asia/Yekaterinburg',
+    'Pakistan Standard Time': 'Asia/Karachi',
+    'Qyzylorda Standard Time': 'Asia/Qyzylorda',
+    'India Standard Time': 'Asia/Kolkata',
+    'Sri Lanka Standard Time': 'Asia/Colombo',
+    'Nepal Standard Time': 'Asia/Kathmandu',
+    'Central Asia Standard Time': 'Asia/Almaty',
+    'Bangladesh Standard Time': 'Asia/Dhaka',
+    'Omsk Standard Time': 'Asia/Omsk',
+    'Myanmar Standard Time': 'Asia/Yangon',
+    'SE Asia Standard Time': 'Asia/Bangkok',
+    'Altai Standard Time': 'Asia/Barnaul',
+    'W. Mongolia Standard Time': 'Asia/Hovd',
+    'North Asia Standard Time': 'Asia/Krasnoyarsk',
+    'N. Central Asia Standard Time': 'Asia/Novosibirsk',
+    'Tomsk Standard Time': 'Asia/Tomsk',
+    'China Standard Time': 'Asia/Shanghai',
+    'North Asia East Standard Time': 'Asia/Irkutsk',
+    'Singapore Standard Time': 'Asia/Singapore',
+    'W. Australia Standard Time': 'Australia/Perth',
+    'Taipei Standard Time': 'Asia/Taipei',
+    'Ulaanbaatar Standard Time': 'Asia/Ulaanbaatar',
+    'Aus Central W. Standard Time': 'Australia/Eucla',
+    'Transbaikal Standard Time': 'Asia/Chita',
+    'Tokyo Standard Time': 'Asia/Tokyo',
+    'North Korea Standard Time': 'Asia/Pyongyang',
+    'Korea Standard Time': 'Asia/Seoul',
+    'Yakutsk Standard Time': 'Asia/Yakutsk',
+    'Cen. Australia Standard Time': 'Australia/Adelaide',
+    'AUS Central Standard Time': 'Australia/Darwin',
+    'E. Australia Standard Time': 'Australia/Brisbane',
+    'AUS Eastern Standard Time': 'Australia/Sydney',
+    'West Pacific Standard Time': 'Pacific/Port_Moresby',
+    'Tasmania Standard Time': 'Australia/Hobart',
+    'Vladivostok Standard Time': 'Asia/Vladivostok',
+    'Lord Howe Standard Time': 'Australia/Lord_Howe',
+    'Bougainville Standard Time': 'Pacific/Bougainville',
+    'Russia Time Zone 10': 'Asia/Srednekolymsk',
+    'Magadan Standard Time': 'Asia/Magadan',
+    'Norfolk Standard Time': 'Pacific/Norfolk',
+    'Sakhalin Standard Time': 'Asia/Sakhalin',
+    'Central Pacific Standard Time': 'Pacific/Guadalcanal',
+    'Russia Time Zone 11': 'Asia/Kamchatka',
+    'New Zealand Standard Time': 'Pacific/Auckland',
+    'UTC+12': 'Etc/GMT-12',
+    'Fiji Standard Time': 'Pacific/Fiji',
+    'Chatham Islands Standard Time': 'Pacific/Chatham',
+    'UTC+13': 'Etc/GMT-13',
+    'Tonga Standard Time': 'Pacific/Tongatapu',
+    'Samoa Standard Time': 'Pacific/Apia',
+    'Line Islands Standard Time': 'Pacific/Kiritimati',
+}
+
+# Windows timezone name: the IANA names that map to it (space separated),
+# from the CLDR windowsZones.xml mapZones for all territories
+_CLDR_WINDOWS_ZONES = {
+    'AUS Central Standard Time': 'Australia/Darwin Australia/North',
+    'AUS Eastern Standard Time': (
+        'Australia/ACT Australia/Canberra Australia/Melbourne Australia/NSW Australia/Sydney '
+        'Australia/Victoria'
+    ),
+    'Afghanistan Standard Time': 'Asia/Kabul',
+    'Alaskan Standard Time': (
+        'America/Anchorage America/Juneau America/Metlakatla America/Nome America/Sitka America/Yakutat '
+        'US/Alaska'
+    ),
+    'Aleutian Standard Time': 'America/Adak America/Atka US/Aleutian',
+    'Altai Standard Time': 'Asia/Barnaul',
+    'Arab Standard Time': 'Asia/Aden Asia/Bahrain Asia/Kuwait Asia/Qatar Asia/Riyadh',
+    'Arabian Standard Time': 'Asia/Dubai Asia/Muscat Etc/GMT-4',
+    'Arabic Standard Time': 'Asia/Baghdad',
+    'Argentina Standard Time': (
+        'America/Argentina/Buenos_Aires America/Argentina/Catamarca America/Argentina/ComodRivadavia '
+        'America/Argentina/Cordoba America/Argentina/Jujuy America/Argentina/La_Rioja '
+        'America/Argentina/Mendoza America/Argentina/Rio_Gallegos America/Argentina/Salta '
+        'America/Argentina/San_Juan America/Argentina/San_Luis America/Argentina/Tucuman '
+        'America/Argentina/Ushuaia America/Buenos_Aires America/Catamarca America/Cordoba America/Jujuy '
+        'America/Mendoza America/Rosario'
+    ),
+    'Astrakhan Standard Time': 'Europe/Astrakhan Europe/Ulyanovsk',
+    'Atlantic Standard Time': (
+        'America/Glace_Bay America/Goose_Bay America/Halifax America/Moncton America/Thule Atlantic/Bermuda '
+        'Canada/Atlantic'
+    ),
+    'Aus Central W. Standard Time': 'Australia/Eucla',
+    'Azerbaijan Standard Time': 'Asia/Baku',
+    'Azores Standard Time': 'America/Scoresbysund Atlantic/Azores',
+    'Bahia Standard Time': 'America/Bahia',
+    'Bangladesh Standard Time': 'Asia/Dacca Asia/Dhaka Asia/Thimbu Asia/Thimphu',
+    'Belarus Standard Time': 'Europe/Minsk',
+    'Bougainville Standard Time': 'Pacific/Bougainville',
+    'Canada Central Standard Time': 'America/Regina America/Swift_Current Canada/Saskatchewan',
+    'Cape Verde Standard Time': 'Atlantic/Cape_Verde Etc/GMT+1',
+    'Caucasus Standard Time': 'Asia/Yerevan',
+    'Cen. Australia Standard Time': 'Australia/Adelaide Australia/Broken_Hill Australia/South Australia/Yancowinna',
+    'Central America Standard Time': (
+        'America/Belize America/Costa_Rica America/El_Salvador America/Guatemala America/Managua '
+        'America/Tegucigalpa Etc/GMT+6 Pacific/Galapagos'
+    ),
+    'Central Asia Standard Time': (
+        'Antarctica/Vostok Asia/Almaty Asia/Bishkek Asia/Kashgar Asia/Qostanay Asia/Urumqi Etc/GMT-6 '
+        'Indian/Chagos'
+    ),
+    'Central Brazilian Standard Time': 'America/Campo_Grande America/Cuiaba',
+    'Central Europe Standard Time': (
+        'Europe/Belgrade Europe/Bratislava Europe/Budapest Europe/Ljubljana Europe/Podgorica Europe/Prague '
+        'Europe/Tirane'
+    ),
+    'Central European Standard Time': 'Europe/Sarajevo Europe/Skopje Europe/Warsaw Europe/Zagreb Poland',
+    'Central Pacific Standard Time': (
+        'Antarctica/Casey Etc/GMT-11 Pacific/Efate Pacific/Guadalcanal Pacific/Kosrae Pacific/Noumea '
+        'Pacific/Pohnpei Pacific/Ponape'
+    ),
+    'Central Standard Time': (
+        'America/Chicago America/Indiana/Knox America/Indiana/Tell_City America/Knox_IN America/Matamoros '
+        'America/Menominee America/North_Dakota/Beulah America/North_Dakota/Center '
+        'America/North_Dakota/New_Salem America/Ojinaga America/Rainy_River America/Rankin_Inlet '
+        'America/Resolute America/Winnipeg CST6CDT Canada/Central US/Central US/Indiana-Starke'
+    ),
+    'Central Standard Time (Mexico)': (
+        'America/Bahia_Banderas America/Chihuahua America/Merida America/Mexico_City America/Monterrey '
+        'Mexico/General'
+    ),
+    'Chatham Islands Standard Time': 'NZ-CHAT Pacific/Chatham',
+    'China Standard Time': (
+        'Asia/Chongqing Asia/Chungking Asia/Harbin Asia/Hong_Kong Asia/Macao Asia/Macau Asia/Shanghai '
+        'Hongkong PRC'
+    ),
+    'Cuba Standard Time': 'America/Havana Cuba',
+    'Dateline Standard Time': 'Etc/GMT+12',
+    'E. Africa Standard Time': (
+        'Africa/Addis_Ababa Africa/Asmara Africa/Asmera Africa/Dar_es_Salaam Africa/Djibouti Africa/Kampala '
+        'Africa/Mogadishu Africa/Nairobi Antarctica/Syowa Etc/GMT-3 Indian/Antananarivo Indian/Comoro '
+        'Indian/Mayotte'
+    ),
+    'E. Australia Standard Time': 'Australia/Brisbane Australia/Lindeman Australia/Queensland',
+    'E. Europe Standard Time': 'Europe/Chisinau Europe/Tiraspol',
+    'E. South America Standard Time': 'America/Sao_Paulo Brazil/East',
+    'Easter Island Standard Time': 'Chile/EasterIsland Pacific/Easter',
+    'Eastern Standard Time': (
+        'America/Detroit America/Indiana/Petersburg America/Indiana/Vincennes America/Indiana/Winamac '
+        'America/Iqaluit America/Kentucky/Louisville America/Kentucky/Monticello America/Louisville '
+        'America/Montreal America/Nassau America/New_York America/Nipigon America/Pangnirtung '
+        'America/Thunder_Bay America/Toronto Canada/Eastern EST5EDT US/Eastern US/Michigan'
+    ),
+    'Eastern Standard Time (Mexico)': 'America/Cancun',
+    'Egypt Standard Time': 'Africa/Cairo Egypt',
+    'Ekaterinburg Standard Time': 'Asia/Yekaterinburg',
+    'FLE Standard Time': (
+        'Europe/Helsinki Europe/Kiev Europe/Kyiv Europe/Mariehamn Europe/Riga Europe/Sofia Europe/Tallinn '
+        'Europe/Uzhgorod Europe/Vilnius Europe/Zaporozhye'
+    ),
+    'Fiji Standard Time': 'Pacific/Fiji',
+    'GMT Standard Time': (
+        'Atlantic/Canary Atlantic/Faeroe Atlantic/Faroe Atlantic/Madeira Eire Europe/Belfast Europe/Dublin '
+        'Europe/Guernsey Europe/Isle_of_Man Europe/Jersey Europe/Lisbon Europe/London GB GB-Eire Portugal'
+    ),
+    'GTB Standard Time': 'Asia/Famagusta Asia/Nicosia Europe/Athens Europe/Bucharest Europe/Nicosia',
+    'Georgian Standard Time': 'Asia/Tbilisi',
+    'Greenland Standard Time': 'America/Godthab America/Nuuk',
+    'Greenwich Standard Time': (
+        'Africa/Abidjan Africa/Accra Africa/Bamako Africa/Banjul Africa/Bissau Africa/Conakry Africa/Dakar '
+        'Africa/Freetown Africa/Lome Africa/Monrovia Africa/Nouakchott Africa/Ouagadougou Africa/Timbuktu '
+        'America/Danmarkshavn Atlantic/Reykjavik Atlantic/St_Helena Iceland'
+    ),
+    'Haiti Standard Time': 'America/Port-au-Prince',
+    'Hawaiian Standard Time': 'Etc/GMT+10 Pacific/Honolulu Pacific/Johnston Pacific/Rarotonga Pacific/Tahiti US/Hawaii',
+    'India Standard Time': 'Asia/Calcutta Asia/Kolkata',
+    'Iran Standard Time': 'Asia/Tehran Iran',
+    'Israel Standard Time': 'Asia/Jerusalem Asia/Tel_Aviv Israel',
+    'Jordan Standard Time': 'Asia/Amman',
+    'Kaliningrad Standard Time': 'Europe/Kaliningrad',
+    'Korea Standard Time': 'Asia/Seoul ROK',
+    'Libya Standard Time': 'Africa/Tripoli Libya',
+    'Line Islands Standard Time': 'Etc/GMT-14 Pacific/Kiritimati',
+    'Lord Howe Standard Time': 'Australia/LHI Australia/Lord_Howe',
+    'Magadan Standard Time': 'Asia/Magadan',
+    'Magallanes Standard Time': 'America/Punta_Arenas',
+    'Marquesas Standard Time': 'Pacific/Marquesas',
+    'Mauritius Standard Time': 'Indian/Mahe Indian/Mauritius Indian/Reunion',
+    'Middle East Standard Time': 'Asia/Beirut',
+    'Montevideo Standard Time': 'America/Montevideo',
+    'Morocco Standard Time': 'Africa/Casablanca Africa/El_Aaiun',
+    'Mountain Standard Time': (
+        'America/Boise America/Cambridge_Bay America/Ciudad_Juarez America/Denver America/Edmonton '
+        'America/Inuvik America/Shiprock America/Yellowknife Canada/Mountain MST7MDT Navajo US/Mountain'
+    ),
+    'Mountain Standard Time (Mexico)': 'America/Mazatlan Mexico/BajaSur',
+    'Myanmar Standard Time': 'Asia/Rangoon Asia/Yangon Indian/Cocos',
+    'N. Central Asia Standard Time': 'Asia/Novosibirsk',
+    'Namibia Standard Time': 'Africa/Windhoek',
+    'Nepal Standard Time': 'Asia/Kathmandu Asia/Katmandu',
+    'New Zealand Standard Time': 'Antarctica/McMurdo Antarctica/South_Pole NZ Pacific/Auckland',
+    'Newfoundland Standard Time': 'America/St_Johns Canada/Newfoundland',
+    'Norfolk Standard Time': 'Pacific/Norfolk',
+    'North Asia East Standard Time': 'Asia/Irkutsk',
+    'North Asia Standard Time': 'Asia/Krasnoyarsk Asia/Novokuznetsk',
+    'North Korea Standard Time': 'Asia/Pyongyang',
+    'Omsk Standard Time': 'Asia/Omsk',
+    'Pacific SA Standard Time': 'America/Santiago Chile/Continental',
+    'Pacific Standard Time': 'America/Los_Angeles America/Vancouver Canada/Pacific PST8PDT US/Pacific',
+    'Pacific Standard Time (Mexico)': 'America/Ensenada America/Santa_Isabel America/Tijuana Mexico/BajaNorte',
+    'Pakistan Standard Time': 'Asia/Karachi',
+    'Paraguay Standard Time': 'America/Asuncion',
+    'Qyzylorda Standard Time': 'Asia/Qyzylorda',
+    'Romance Standard Time': 'Africa/Ceuta Europe/Brussels Europe/Copenhagen Europe/Madrid Europe/Paris',
+    'Russia Time Zone 10': 'Asia/Srednekolymsk',
+    'Russia Time Zone 11': 'Asia/Anadyr Asia/Kamchatka',
+    'Russia Time Zone 3': 'Europe/Samara',
+    'Russian Standard Time': 'Europe/Kirov Europe/Moscow Europe/Simferopol W-SU',
+    'SA Eastern Standard Time': (
+        'America/Belem America/Cayenne America/Fortaleza America/Maceio America/Paramaribo America/Recife '
+        'America/Santarem Antarctica/Palmer Antarctica/Rothera Atlantic/Stanley Etc/GMT+3'
+    ),
+    'SA Pacific Standard Time': (
+        'America/Atikokan America/Bogota America/Cayman America/Coral_Harbour America/Eirunepe '
+        'America/Guayaquil America/Jamaica America/Lima America/Panama America/Porto_Acre America/Rio_Branco '
+        'Brazil/Acre Etc/GMT+5 Jamaica'
+    ),
+    'SA Western Standard Time': (
+        'America/Anguilla America/Antigua America/Aruba America/Barbados America/Blanc-Sablon '
+        'America/Boa_Vista America/Curacao America/Dominica America/Grenada America/Guadeloupe America/Guyana '
+        'America/Kralendijk America/La_Paz America/Lower_Princes America/Manaus America/Marigot '
+        'America/Martinique America/Montserrat America/Port_of_Spain America/Porto_Velho America/Puerto_Rico '
+        'America/Santo_Domingo America/St_Barthelemy America/St_Kitts America/St_Lucia America/St_Thomas '
+        'America/St_Vincent America/Tortola America/Virgin Brazil/West Etc/GMT+4'
+    ),
+    'SE Asia Standard Time': (
+        'Antarctica/Davis Asia/Bangkok Asia/Ho_Chi_Minh Asia/Jakarta Asia/Phnom_Penh Asia/Pontianak '
+        'Asia/Saigon Asia/Vientiane Etc/GMT-7 Indian/Christmas'
+    ),
+    'Saint Pierre Standard Time': 'America/Miquelon',
+    'Sakhalin Standard Time': 'Asia/Sakhalin',
+    'Samoa Standard Time': 'Pacific/Apia',
+    'Sao Tome Standard Time': 'Africa/Sao_Tome',
+    'Saratov Standard Time': 'Europe/Saratov',
+    'Singapore Standard Time': (
+        'Asia/Brunei Asia/Kuala_Lumpur Asia/Kuching Asia/Makassar Asia/Manila Asia/Singapore '
+        'Asia/Ujung_Pandang Etc/GMT-8 Singapore'
+    ),
+    'South Africa Standard Time': (
+        'Africa/Blantyre Africa/Bujumbura Africa/Gaborone Africa/Harare Africa/Johannesburg Africa/Kigali '
+        'Africa/Lubumbashi Africa/Lusaka Africa/Maputo Africa/Maseru Africa/Mbabane Etc/GMT-2'
+    ),
+    'South Sudan Standard Time': 'Africa/Juba',
+    'Sri Lanka Standard Time': 'Asia/Colombo',
+    'Sudan Standard Time': 'Africa/Khartoum',
+    'Syria Standard Time': 'Asia/Damascus',
+    'Taipei Standard Time': 'Asia/Taipei ROC',
+    'Tasmania Standard Time': 'Antarctica/Macquarie Australia/Currie Australia/Hobart Australia/Tasmania',
+    'Tocantins Standard Time': 'America/Araguaina',
+    'Tokyo Standard Time': 'Asia/Dili Asia/Jayapura Asia/Tokyo Etc/GMT-9 Japan Pacific/Palau',
+    'Tomsk Standard Time': 'Asia/Tomsk',
+    'Tonga Standard Time': 'Pacific/Tongatapu',
+    'Transbaikal Standard Time': 'Asia/Chita',
+    'Turkey Standard Time': 'Asia/Istanbul Europe/Istanbul Turkey',
+    'Turks And Caicos Standard Time': 'America/Grand_Turk',
+    'US Eastern Standard Time': (
+        'America/Fort_Wayne America/Indiana/Indianapolis America/Indiana/Marengo America/Indiana/Vevay '
+        'America/Indianapolis'
+    ),
+    'US Mountain Standard Time': (
+        'America/Creston America/Dawson_Creek America/Fort_Nelson America/Hermosillo America/Phoenix '
+        'Etc/GMT+7 US/Arizona'
+    ),
+    'UTC': (
+        'Etc/GMT Etc/GMT+0 Etc/GMT-0 Etc/GMT0 Etc/Greenwich Etc/UCT Etc/UTC Etc/Universal Etc/Zulu GMT+0 '
+        'GMT-0 GMT0 Greenwich UCT UTC Universal Zulu'
+    ),
+    'UTC+12': (
+        'Etc/GMT-12 Kwajalein Pacific/Funafuti Pacific/Kwajalein Pacific/Majuro Pacific/Nauru Pacific/Tarawa '
+        'Pacific/Wake Pacific/Wallis'
+    ),
+    'UTC+13': 'Etc/GMT-13 Pacific/Enderbury Pacific/Fakaofo Pacific/Kanton',
+    'UTC-02': 'America/Noronha Atlantic/South_Georgia Brazil/DeNoronha Etc/GMT+2',
+    'UTC-08': 'Etc/GMT+8 Pacific/Pitcairn',
+    'UTC-09': 'Etc/GMT+9 Pacific/Gambier',
+    'UTC-11': 'Etc/GMT+11 Pacific/Midway Pacific/Niue Pacific/Pago_Pago Pacific/Samoa US/Samoa',
+    'Ulaanbaatar Standard Time': 'Asia/Choibalsan Asia/Ulaanbaatar Asia/Ulan_Bator',
+    'Venezuela Standard Time': 'America/Caracas',
+    'Vladivostok Standard Time': 'Asia/Ust-Nera Asia/Vladivostok',
+    'Volgograd Standard Time': 'Europe/Volgograd',
+    'W. Australia Standard Time': 'Australia/Perth Australia/West',
+    'W. Central Africa Standard Time': (
+        'Africa/Algiers Africa/Bangui Africa/Brazzaville Africa/Douala Africa/Kinshasa Africa/Lagos '
+        'Africa/Libreville Africa/Luanda Africa/Malabo Africa/Ndjamena Africa/Niamey Africa/Porto-Novo '
+        'Africa/Tunis Etc/GMT-1'
+    ),
+    'W. Europe Standard Time': (
+        'Arctic/Longyearbyen Atlantic/Jan_Mayen Europe/Amsterdam Europe/Andorra Europe/Berlin Europe/Busingen '
+        'Europe/Gibraltar Europe/Luxembourg Europe/Malta Europe/Monaco Europe/Oslo Europe/Rome '
+        'Europe/San_Marino Europe/Stockholm Europe/Vaduz Europe/Vatican Europe/Vienna Europe/Zurich'
+    ),
+    'W. Mongolia Standard Time': 'Asia/Hovd',
+    'West Asia Standard Time': (
+        'Antarctica/Mawson Asia/Aqtau Asia/Aqtobe Asia/Ashgabat Asia/Ashkhabad Asia/Atyrau Asia/Dushanbe '
+        'Asia/Oral Asia/Samarkand Asia/Tashkent Etc/GMT-5 Indian/Kerguelen Indian/Maldives'
+    ),
+    'West Bank Standard Time': 'Asia/Gaza Asia/Hebron',
+    'West Pacific Standard Time': (
+        'Antarctica/DumontDUrville Etc/GMT-10 Pacific/Chuuk Pacific/Guam Pacific/Port_Moresby Pacific/Saipan '
+        'Pacific/Truk Pacific/Yap'
+    ),
+    'Yakutsk Standard Time': 'Asia/Khandyga Asia/Yakutsk',
+    'Yukon Standard Time': 'America/Dawson America/Whitehorse Canada/Yukon',
+}
+
+IANA_TO_WINDOWS = {iana: windows for windows, iana in WINDOWS_TO_IANA.items()}
+IANA_TO_WINDOWS.update(
+    (iana, windows) for windows, ianaNames in _CLDR_WINDOWS_ZONES.items() for iana in ianaNames.split()
+)
+IANA_TO_WINDOWS.update({  # tzdata names that this version of the CLDR list doesn't have
+    'GMT': 'UTC',
+    'US/East-Indiana': 'US Eastern Standard Time',
+    'America/Coyhaique': 'Magallanes Standard Time',
+})
+
+# time.tzname abbreviations, used when the IANA name of this machine cannot be found
+TZ_ABBREVIATION_TO_WINDOWS = {
+    'EST': 'Eastern Standard Time',
+    'CST': 'Central Standard Time',
+    'MST': 'Mountain Standard Time',
+    'PST': 'Pacific Standard Time',
+    'AKST': 'Alaskan Standard Time',
+    'HST': 'Hawaiian Standard Time',
+    'AST': 'Atlantic Standard Time',
+    'NST': 'Newfoundland Standard Time',
+    'GMT': 'GMT Standard Time',
+    'UTC': 'UTC',
+    'WET': 'GMT Standard Time',
+    'CET': 'W. Europe Standard Time',
+    'MET': 'W. Europe Standard Time',
+    'EET': 'FLE Standard Time',
+    'MSK': 'Russian Standard Time',
+    'IST': 'India Standard Time',
+    'JST': 'Tokyo Standard Time',
+    'KST': 'Korea Standard Time',
+    'AWST': 'W. Australia Standard Time',
+    'ACST': 'Cen. Australia Standard Time',
+    'AEST': 'AUS Eastern Standard Time',
+    'NZST': 'New Zealand Standard Time',
+}
+
+
+def ConvertTimezoneNameToWindows(name):
+    '''
+    :param name: str, a Windows or IANA timezone name, like "Eastern Standard Time" or "America/New_York"
+    :return: str, the Windows name, or name unchanged if it is not known
+    '''
+    if name in WINDOWS_TO_IANA:
+        return name
+    return IANA_TO_WINDOWS.get(name) or TZ_ABBREVIATION_TO_WINDOWS.get(name) or name
+
+
+# {standard UTC offset in minutes: (Windows name without DST, Windows name with DST)},
+# used when neither the IANA name nor the abbreviation of this machine's timezone is known
+OFFSET_TO_WINDOWS = {
+    -720: ('Dateline Standard Time', 'Dateline Standard Time'),
+    -660: ('UTC-11', 'UTC-11'),
+    -600: ('Hawaiian Standard Time', 'Aleutian Standard Time'),
+    -570: ('Marquesas Standard Time', 'Marquesas Standard Time'),
+    -540: ('UTC-09', 'Alaskan Standard Time'),
+    -480: ('UTC-08', 'Pacific Standard Time'),
+    -420: ('US Mountain Standard Time', 'Mountain Standard Time'),
+    -360: ('Central America Standard Time', 'Central Standard Time'),
+    -300: ('SA Pacific Standard Time', 'Eastern Standard Time'),
+    -240: ('SA Western Standard Time', 'Atlantic Standard Time'),
+    -210: ('Newfoundland Standard Time', 'Newfoundland Standard Time'),
+    -180: ('SA Eastern Standard Time', 'Greenland Standard Time'),
+    -120: ('UTC-02', 'UTC-02'),
+    -60: ('Cape Verde Standard Time', 'Azores Standard Time'),
+    0: ('UTC', 'GMT Standard Time'),
+    60: ('W. Central Africa Standard Time', 'W. Europe Standard Time'),
+    120: ('South Africa Standard Time', 'FLE Standard Time'),
+    180: ('E. Africa Standard Time', 'E. Africa Standard Time'),
+    210: ('Iran Standard Time', 'Iran Standard Time'),
+    240: ('Arabian Standard Time', 'Arabian Standard Time'),
+    270: ('Afghanistan Standard Time', 'Afghanistan Standard Time'),
+    300: ('West Asia Standard Time', 'West Asia Standard Time'),
+    330: ('India Standard Time', 'India Standard Time'),
+    345: ('Nepal Standard Time', 'Nepal Standard Time'),
+    360: ('Central Asia Standard Time', 'Central Asia Standard Time'),
+    390: ('Myanmar Standard Time', 'Myanmar Standard Time'),
+    420: ('SE Asia Standard Time', 'SE Asia Standard Time'),
+    480: ('Singapore Standard Time', 'Singapore Standard Time'),
+    525: ('Aus Central W. Standard Time', 'Aus Central W. Standard Time'),
+    540: ('Tokyo Standard Time', 'Tokyo Standard Time'),
+    570: ('AUS Central Standard Time', 'Cen. Australia Standard Time'),
+    600: ('E. Australia Standard Time', 'AUS Eastern Standard Time'),
+    630: ('Lord Howe Standard Time', 'Lord Howe Standard Time'),
+    660: ('Central Pacific Standard Time', 'Norfolk Standard Time'),
+    720: ('UTC+12', 'New Zealand Standard Time'),
+    765: ('Chatham Islands Standard Time', 'Chatham Islands Standard Time'),
+    780: ('UTC+13', 'Samoa Standard Time'),
+    840: ('Line Islands Standard Time', 'Line Islands Standard Time'),
+}
+
+
+def _ZoneinfoPathToName(path):
+    # "/usr/share/zoneinfo/posix/America/New_York" > "America/New_York"
+    name = path.split('zoneinfo/', 1)[1]
+    for prefix in ('posix/', 'right/'):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    return name
+
+
+def _GetLocalIANATimezoneName():
+    # returns the IANA name of the timezone this process is running in, or None if it can't be found
+    if 'TZ' in os.environ:
+        # the process uses $TZ, /etc/localtime may describe a different zone
+        name = os.environ['TZ'].lstrip(':')
+        if 'zoneinfo/' in name:
+            name = _ZoneinfoPathToName(name)
+        return name or 'UTC'  # an empty TZ means UTC
+
+    try:
+        path = os.path.realpath('/etc/localtime')
+        if 'zoneinfo/' in path:
+            return _ZoneinfoPathToName(path)
+    except Exception:
+        pass
+
+    try:
+        with open('/etc/timezone') as file:
+            return file.read().strip() or None
+    except Exception:
+        return None
+
+
+_localWindowsTimezoneName = None  # see GetLocalWindowsTimezoneName
+
+
+def GetLocalWindowsTimezoneName():
+    '''
+    Finds the Windows timezone name of the timezone this process is running in.
+    The IANA name is used if it is known, then the time.tzname abbreviation, then the UTC offset.
+    The result is cached for the life of the process.
+
+    :return: str, like "Eastern Standard Time"
+    '''
+    global _localWindowsTimezoneName
+    if _localWindowsTimezoneName is None:
+        ianaName = _GetLocalIANATimezoneName()
+        name = IANA_TO_WINDOWS.get(ianaName) or TZ_ABBREVIATION_TO_WINDOWS.get(time.tzname[0])
+        if name is None:
+            noDST, withDST = OFFSET_TO_WINDOWS.get(-time.timezone // 60, ('UTC', 'UTC'))
+            name = withDST if time.daylight else noDST
+            print('gs_exchange_interface: Unknown timezone {} ({}). Using "{}" for MeetingTimeZone'.format(
+                ianaName,
+                time.tzname,
+                name,
+            ))
+        _localWindowsTimezoneName = name
+    return _localWindowsTimezoneName
+
+
+TZ_NAME = GetLocalWindowsTimezoneName()
+
+_timeStringCache = {}  # {timeString: datetime}, see ConvertTimeStringsToDatetimes
+TIME_STRING_CACHE_SIZE = 4096
+
+
+def ConvertTimeStringsToDatetimes(timeStrings):
+    '''
+    Same as ConvertTimeStringToDatetime, for many time strings at once.
+    Each different time string is only converted once. Meetings usually start/end on the hour or half hour,
+        and back-to-back meetings share times, so a FindItem response repeats many of its time strings.
+    The conversions are remembered for the next call as well.
+
+    :param timeStrings: iterable of str
+    :return: list of datetime
+    '''
+    if len(_timeStringCache) > TIME_STRING_CACHE_SIZE:
+        _timeStringCache.clear()
+
+    ret = []
+    for timeString in timeStrings:
+        dt = _timeStringCache.get(timeString)
+        if dt is None:
+            dt = _timeStringCache[timeString] = ConvertTimeStringToDatetime(timeString)
+        ret.append(dt)
+    return ret
+
 ########################################
 
 RE_CAL_ITEM = re.compile('<t:CalendarItem>[\w\W]*?<\/t:CalendarItem>')
@@ -50,9 +631,24 @@ RE_HTML_BODY = re.compile('<t:Body BodyType="HTML">([\w\W]*)</t:Body>', re.IGNOR
 
 RE_EMAIL_ADDRESS = re.compile('.*?\@.*?\..*?')
 
+RE_ATTACHMENT_ID = re.compile('<t:AttachmentId Id="(.*?)"')  # within a CreateAttachment response
+RE_ROOT_ITEM_CHANGE_KEY = re.compile('RootItemChangeKey="(.*?)"')  # within a CreateAttachment response
+
+RE_CAPTURE_OPERATION = re.compile('<soap:Body>\s*<m:(\w+)')  # group(1) = FindItem, GetAttachment, ...
+RE_CAPTURE_ATTACHMENT_CONTENT = re.compile('<t:Content>([^<]*)</t:Content>')
+RE_CAPTURE_BEARER = re.compile('Bearer\s+[\w\-.~+/=]+', re.IGNORECASE)
+RE_CAPTURE_SECRET = re.compile(
+    '''((?:access_token|refresh_token|id_token|client_secret|password)["']?\s*[:=]\s*["']?)[^"'&\s<]+''',
+    re.IGNORECASE
+)
+
 RE_ERROR_CLASS = re.compile('ResponseClass="Error"', re.IGNORECASE)
 RE_ERROR_MESSAGE = re.compile('<m:MessageText>([\w\W]*)</m:MessageText>')
 
+MIN_EXPORT_WINDOW = datetime.timedelta(minutes=1)  # IterCalendarRange will not split a window smaller than this
+CAPTURE_FSYNC_INTERVAL = 5  # seconds, how often EWS.StartCapture forces its records to disk
+ICS_DT_FORMAT = '%Y%m%dT%H%M%S'  # floating (local) time, see module docstring
+
 
 class EWS(_BaseCalendar):
     def __init__(
@@ -80,30 +676,25 @@ class EWS(_BaseCalendar):
         self._verifyCerts = verifyCerts
         self._debug = debug
 
-        thisMachineTimezoneName = time.tzname[0]
-        if thisMachineTimezoneName == 'EST':
-            thisMachineTimezoneName = 'Eastern Standard Time'
-        elif thisMachineTimezoneName == 'PST':
-            thisMachineTimezoneName = 'Pacific Standard Time'
-        elif thisMachineTimezoneName == 'CST':
-            thisMachineTimezoneName = 'Central Standard Time'
-
-        self._myTimezoneName = myTimezoneName or thisMachineTimezoneName
+        self._myTimezoneName = ConvertTimezoneNameToWindows(myTimezoneName) if myTimezoneName else TZ_NAME
         if self._debug: print('myTimezoneName=', self._myTimezoneName)
 
-        self._session = requests.session()
-
-        self._session.headers['Content-Type'] = 'text/xml'
+        self._requestsSession = None  # created on the first request, see _session
 
         if callable(oauthCallback) or authType == 'Oauth':
             self._authType = authType = 'Oauth'
         elif authType == 'Basic':
-            self._session.auth = requests.auth.HTTPBasicAuth(self._username, self._password)
+            pass
         else:
             raise TypeError('Unknown Authorization Type')
         self._useImpersonationIfAvailable = True
         self._useDistinguishedFolderMailbox = False
 
+        self._lastResponseDigest = None  # the last FindItem response that was registered, see UpdateCalendar
+        self._calItemCache = {}  # {(ItemId, ChangeKey): _CalendarItem} from the last FindItem response
+
+        self._recorder = None  # _TrafficRecorder, see StartCapture
+
     def print(self, *a, **k):
         if self._debug:
             print(*a, **k)
@@ -124,6 +715,21 @@ class EWS(_BaseCalendar):
                 self._authType
             )
 
+    @property
+    def _session(self):
+        if self._requestsSession is None:
+            requests = _ImportRequests()
+            session = requests.session()
+            session.headers['Content-Type'] = 'text/xml'
+            if self._authType == 'Basic':
+                session.auth = requests.auth.HTTPBasicAuth(self._username, self._password)
+            self._requestsSession = session
+        return self._requestsSession
+
+    @_session.setter
+    def _session(self, session):
+        self._requestsSession = session
+
     @property
     def Impersonation(self):
         return self._impersonation
@@ -132,6 +738,32 @@ class EWS(_BaseCalendar):
     def Impersonation(self, newImpersonation):
         self._impersonation = newImpersonation
 
+    def StartCapture(self, path):
+        '''
+        Records every request/response to a gzipped NDJSON archive, which can be replayed later with StartReplay.
+        Headers are never recorded (so no Authorization header), tokens/passwords are removed from the bodies
+            and attachment content is replaced by zeros.
+
+        :param path: str, like "capture.ndjson.gz". If the file exists, the new records are appended
+        '''
+        self.StopCapture()
+        self._recorder = _TrafficRecorder(path)
+
+    def StopCapture(self):
+        if self._recorder:
+            self._recorder.Close()
+            self._recorder = None
+
+    def StartReplay(self, path, realTiming=True):
+        '''
+        Answers every request with a response from an archive made by StartCapture, instead of using the network.
+        Responses are matched to requests by EWS operation (FindItem, GetAttachment, ...), in the order they were recorded.
+
+        :param path: str
+        :param realTiming: bool, if True each response is delayed by the time the real request took
+        '''
+        self._session = _ReplaySession(path, realTiming=realTiming)
+
     def _DoRequest(self, soapBody, truncatePrint=False):
         # API_VERSION = 'Exchange2013'
         # API_VERSION = 'Exchange2007_SP1'
@@ -165,20 +797,26 @@ class EWS(_BaseCalendar):
                 xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"
             >'''
 
-        xml = '''<?xml version="1.0" encoding="utf-8"?>
+        xmlHead = '''<?xml version="1.0" encoding="utf-8"?>
                     {soapEnvelopeOpenTag}
                         <soap:Header>
                             {soapHeader}
                         </soap:Header>
                         <soap:Body>
-                            {soapBody}
-                        </soap:Body>
-                    </soap:Envelope>
-        '''.format(
+                            '''.format(
             soapEnvelopeOpenTag=soapEnvelopeOpenTag,
             soapHeader=soapHeader,
-            soapBody=soapBody,
         )
+        xmlTail = '''
+                        </soap:Body>
+                    </soap:Envelope>
+        '''
+
+        if isinstance(soapBody, str):
+            xml = xmlHead + soapBody + xmlTail
+        else:
+            # soapBody is a _StreamingBody, send it without building the whole request in memory
+            xml = _StreamingBody(xmlHead, soapBody, xmlTail)
 
         if self._debug:
             print('xml=', xml)
@@ -197,12 +835,16 @@ class EWS(_BaseCalendar):
                     v = v[:15] + '...'
                 self.print('header', k, v)
 
+        startTime = time.perf_counter()
         resp = self._session.request(
             method='POST',
             url=url,
             data=xml,
             verify=self._verifyCerts,
         )
+        if self._recorder:
+            self._recorder.Record(url, xml, resp, time.perf_counter() - startTime)
+
         if self._debug:
             print('resp.status_code=', resp.status_code)
             print('resp.reason=', resp.reason)
@@ -233,16 +875,39 @@ class EWS(_BaseCalendar):
     def UpdateCalendar(self, calendar=None, startDT=None, endDT=None):
         self.print('UpdateCalendar(', calendar, startDT, endDT)
 
+        # RegisterCalendarItems uses the window to find deleted items, so a window that was passed in is part of the digest.
+        # The default window moves on every call and is left out, so that repeated polls can skip the parsing
+        window = '{}|{}'.format(startDT or '', endDT or '')
+
         startDT = startDT or datetime.datetime.now() - datetime.timedelta(days=1)
         startDT = startDT.replace(second=0, microsecond=0)
 
         endDT = endDT or datetime.datetime.now() + datetime.timedelta(days=7)
 
+        calendar = calendar or self._impersonation or self._username
+
+        resp = self._FindItem(startDT, endDT)
+        if resp.ok:
+            digest = hashlib.sha1((window + resp.text).encode()).digest()
+            if digest == self._lastResponseDigest:
+                # nothing has changed since the last update, dont bother parsing
+                self.print('UpdateCalendar response unchanged')
+            else:
+                calItems = self._CreateCalendarItemsFromResponse(resp.text)
+                self.RegisterCalendarItems(calItems=calItems, startDT=startDT, endDT=endDT)
+                self._lastResponseDigest = digest
+        else:
+            if 'ErrorImpersonateUserDenied' in resp.text:
+                if self._debug:
+                    print('Impersonation Error. Trying again with delegate access.')
+                return self.UpdateCalendar(calendar, startDT, endDT)
+        return resp
+
+    def _FindItem(self, startDT, endDT, maxEntries=100):
+        # sends a FindItem/CalendarView request for the window startDT > endDT and returns the response
         startTimestring = ConvertDatetimeToTimeString(startDT)
         endTimestring = ConvertDatetimeToTimeString(endDT)
 
-        calendar = calendar or self._impersonation or self._username
-
         if self._useDistinguishedFolderMailbox:
             parentFolder = '''
                 <t:DistinguishedFolderId Id="calendar">
@@ -276,7 +941,7 @@ class EWS(_BaseCalendar):
                     </t:AdditionalProperties>
                 </m:ItemShape>
                 <m:CalendarView 
-                    MaxEntriesReturned="100" 
+                    MaxEntriesReturned="{maxEntries}" 
                     StartDate="{startTimestring}" 
                     EndDate="{endTimestring}" 
                     />
@@ -285,72 +950,194 @@ class EWS(_BaseCalendar):
                 </m:ParentFolderIds>
             </m:FindItem>
         '''.format(
+            maxEntries=maxEntries,
             startTimestring=startTimestring,
             endTimestring=endTimestring,
             parentFolder=parentFolder,
         )
-        resp = self._DoRequest(soapBody)
-        if resp.ok:
-            calItems = self._CreateCalendarItemsFromResponse(resp.text)
-            self.RegisterCalendarItems(calItems=calItems, startDT=startDT, endDT=endDT)
-        else:
-            if 'ErrorImpersonateUserDenied' in resp.text:
-                if self._debug:
-                    print('Impersonation Error. Trying again with delegate access.')
-                return self.UpdateCalendar(calendar, startDT, endDT)
-        return resp
+        return self._DoRequest(soapBody)
 
     def _CreateCalendarItemsFromResponse(self, responseString):
         '''
+        Items with the same ItemId and ChangeKey as in the previous response are not parsed again,
+            the existing _CalendarItem is returned instead.
 
         :param responseString:
         :return: list of calendar items
         '''
-        ret = []
+        keys = []
+        newItems = {}  # {key: (startTimeString, endTimeString, data)}
         for matchCalItem in RE_CAL_ITEM.finditer(responseString):
-            self.print('matchCalItem=', matchCalItem.group(0))
-            # go thru the resposne and find any CalendarItems.
-            # parse their data and findMode CalendarItem objects
-            # store CalendarItem objects in self
-
-            # print('\nmatchCalItem.group(0)=', matchCalItem.group(0))
-
-            data = {}
-            startDT = None
-            endDT = None
-
             matchItemId = RE_ITEM_ID.search(matchCalItem.group(0))
-            data['ItemId'] = matchItemId.group(1)
-            data['ChangeKey'] = matchItemId.group(2)
-            data['Subject'] = RE_SUBJECT.search(matchCalItem.group(0)).group(1)
-            data['OrganizerName'] = RE_ORGANIZER.search(matchCalItem.group(0)).group(1)
-
-            bodyMatch = RE_HTML_BODY.search(matchCalItem.group(0))
-            if bodyMatch:
-                if self._debug: print('bodyMatch=', bodyMatch)
-                data['Body'] = bodyMatch.group(1)
-
-            res = RE_HAS_ATTACHMENTS.search(matchCalItem.group(0)).group(1)
-            self.print('364 RE_HAS_ATTACHMENTS res=', res)
-
-            if 'true' in res:
-                data['HasAttachments'] = True
-            elif 'false' in res:
-                data['HasAttachments'] = False
-            else:
-                data['HasAttachments'] = 'Unknown'
+            key = (matchItemId.group(1), matchItemId.group(2))
+            keys.append(key)
 
-            startTimeString = RE_START_TIME.search(matchCalItem.group(0)).group(1)
-            endTimeString = RE_END_TIME.search(matchCalItem.group(0)).group(1)
+            if key not in self._calItemCache:
+                newItems[key] = self._ParseCalendarItem(matchCalItem.group(0))
 
-            startDT = ConvertTimeStringToDatetime(startTimeString)
-            endDT = ConvertTimeStringToDatetime(endTimeString)
+        cache = {}
+        for key, (startDT, endDT, data) in zip(newItems, self._ConvertCalendarItemTimes(newItems.values())):
+            cache[key] = _CalendarItem(startDT, endDT, data, self)
 
-            calItem = _CalendarItem(startDT, endDT, data, self)
+        ret = []
+        for key in keys:
+            calItem = cache.get(key) or self._calItemCache[key]
+            cache[key] = calItem
             ret.append(calItem)
 
+        self._calItemCache = cache
         return ret
 
+    def _IterCalendarDataFromResponse(self, responseString):
+        '''
+        Parses the CalendarItems in a FindItem response.
+
+        :param responseString:
+        :return: generator of (startDT, endDT, data) tuples
+        '''
+        yield from self._ConvertCalendarItemTimes(
+            self._ParseCalendarItem(matchCalItem.group(0)) for matchCalItem in RE_CAL_ITEM.finditer(responseString)
+        )
+
+    @staticmethod
+    def _ConvertCalendarItemTimes(parsedItems):
+        '''
+        Converts the time strings of all the items at once, see ConvertTimeStringsToDatetimes.
+
+        :param parsedItems: iterable of (startTimeString, endTimeString, data) tuples, from _ParseCalendarItem
+        :return: list of (startDT, endDT, data) tuples
+        '''
+        parsedItems = list(parsedItems)
+        timeStrings = []
+        for startTimeString, endTimeString, data in parsedItems:
+            timeStrings.append(startTimeString)
+            timeStrings.append(endTimeString)
+
+        dts = ConvertTimeStringsToDatetimes(timeStrings)
+        return [(dts[2 * i], dts[2 * i + 1], data) for i, (_, _, data) in enumerate(parsedItems)]
+
+    def _ParseCalendarItem(self, calItemString):
+        '''
+
+        :param calItemString: str, a single <t:CalendarItem> element
+        :return: tuple of (startTimeString, endTimeString, data)
+        '''
+        self.print('matchCalItem=', calItemString)
+        # parse the CalendarItem data
+
+        data = {}
+
+        matchItemId = RE_ITEM_ID.search(calItemString)
+        data['ItemId'] = matchItemId.group(1)
+        data['ChangeKey'] = matchItemId.group(2)
+        data['Subject'] = RE_SUBJECT.search(calItemString).group(1)
+        data['OrganizerName'] = RE_ORGANIZER.search(calItemString).group(1)
+
+        bodyMatch = RE_HTML_BODY.search(calItemString)
+        if bodyMatch:
+            if self._debug: print('bodyMatch=', bodyMatch)
+            data['Body'] = bodyMatch.group(1)
+
+        res = RE_HAS_ATTACHMENTS.search(calItemString).group(1)
+        self.print('364 RE_HAS_ATTACHMENTS res=', res)
+
+        if 'true' in res:
+            data['HasAttachments'] = True
+        elif 'false' in res:
+            data['HasAttachments'] = False
+        else:
+            data['HasAttachments'] = 'Unknown'
+
+        startTimeString = RE_START_TIME.search(calItemString).group(1)
+        endTimeString = RE_END_TIME.search(calItemString).group(1)
+
+        return startTimeString, endTimeString, data
+
+    def IterCalendarRange(self, startDT, endDT, window=datetime.timedelta(days=1)):
+        '''
+        Walks the range startDT > endDT one window at a time and yields the events in it.
+        Only one window of events is held in memory at a time, so the range can be as long as you like.
+        If the server truncates a window (more than 100 events), the window is split in half and re-requested,
+            then the window grows back (doubling) to the requested size once the busy period has passed.
+        If a window of MIN_EXPORT_WINDOW is still truncated, a warning is printed, since events may be missing.
+        Events that span a window boundary are only yielded once (from the window in which they start).
+
+        :param startDT: datetime
+        :param endDT: datetime
+        :param window: timedelta, the size of each FindItem request
+        :return: generator of (startDT, endDT, data) tuples, in order of start time
+        '''
+        self.print('IterCalendarRange(', startDT, endDT, window)
+
+        startDT = startDT.replace(second=0, microsecond=0)
+        windowStart = startDT
+        currentWindow = window  # smaller than window after a truncated response
+        numTruncated = 0  # windows that were still truncated at MIN_EXPORT_WINDOW
+        while windowStart < endDT:
+            windowEnd = min(windowStart + currentWindow, endDT)
+
+            resp = self._FindItem(windowStart, windowEnd)
+            if not resp.ok and 'ErrorImpersonateUserDenied' in resp.text:
+                # _DoRequest has switched impersonation mode, try again once
+                resp = self._FindItem(windowStart, windowEnd)
+            if not resp.ok:
+                raise ConnectionError('EWS FindItem failed. status_code={}, reason={}'.format(
+                    resp.status_code,
+                    resp.reason,
+                ))
+
+            if 'IncludesLastItemInRange="false"' in resp.text:
+                if windowEnd - windowStart > MIN_EXPORT_WINDOW:
+                    # the server capped the response, request a smaller window
+                    currentWindow = (windowEnd - windowStart) / 2
+                    continue
+                else:
+                    # cant split any further, the events after the first 100 in this window may be missing
+                    numTruncated += 1
+                    if numTruncated == 1:
+                        print('EWS IterCalendarRange WARNING: more than 100 events between {} and {} for {}. '
+                              'Only the first 100 are exported.'.format(
+                            windowStart,
+                            windowEnd,
+                            self._impersonation or self._username,
+                        ))
+
+            for itemStartDT, itemEndDT, data in sorted(
+                    self._IterCalendarDataFromResponse(resp.text),
+                    key=lambda t: t[0],
+            ):
+                if itemStartDT < windowEnd and (itemStartDT >= windowStart or windowStart == startDT):
+                    yield itemStartDT, itemEndDT, data
+
+            windowStart = windowEnd
+            currentWindow = min(currentWindow * 2, window)
+
+        if numTruncated > 1:
+            print('EWS IterCalendarRange WARNING: {} windows had more than 100 events for {}. '
+                  'The export is incomplete.'.format(
+                numTruncated,
+                self._impersonation or self._username,
+            ))
+
+    def ExportCalendar(self, fileObj, startDT, endDT, fmt='ics', includeBody=False, **kwargs):
+        '''
+        Writes the events between startDT and endDT to fileObj as they are received.
+
+        :param fileObj: file-like object opened in text mode
+        :param startDT: datetime
+        :param endDT: datetime
+        :param fmt: str, "ics" (iCalendar) or "ndjson" (one JSON object per line)
+        :param includeBody: bool, include the (possibly large) HTML body of each event
+        :param kwargs: passed to IterCalendarRange
+        :return: int, the number of events written
+        '''
+        return _ExportCalendarData(
+            fileObj,
+            [(self._impersonation or self._username, self.IterCalendarRange(startDT, endDT, **kwargs))],
+            fmt=fmt,
+            includeBody=includeBody,
+        )
+
     def CreateCalendarEvent(self, subject, body, startDT, endDT):
         self.print('CreateCalendarEvent(', subject, body, startDT, endDT)
 
@@ -544,6 +1331,418 @@ class EWS(_BaseCalendar):
 
         return [_Attachment(ID, name, self) for name, ID in ret.items()]
 
+    def AddAttachment(self, calItem, fileOrPath, name=None):
+        '''
+        Uploads a file as an attachment to calItem.
+        The file is read and base64 encoded in chunks while the request is being sent,
+            so the whole file is never held in memory.
+        The ChangeKey of calItem is updated from the response.
+
+        :param calItem: _CalendarItem
+        :param fileOrPath: str path, or a file-like object opened in binary mode
+        :param name: str, the attachment name. Defaults to the file name
+        :return: _Attachment, or None if the server returned an error
+        '''
+        self.print('AddAttachment(', calItem, fileOrPath, name)
+
+        if name is None:
+            name = os.path.basename(fileOrPath if isinstance(fileOrPath, str) else getattr(fileOrPath, 'name', 'attachment'))
+
+        soapBody = _StreamingBody(
+            '''
+                <m:CreateAttachment>
+                  <m:ParentItemId Id="{itemID}" ChangeKey="{changeKey}" />
+                  <m:Attachments>
+                    <t:FileAttachment>
+                      <t:Name>{name}</t:Name>
+                      <t:Content>'''.format(
+                itemID=calItem.Get('ItemId'),
+                changeKey=calItem.Get('ChangeKey'),
+                name=_EscapeXML(name),
+            ),
+            _Base64FileStream(fileOrPath),
+            '''</t:Content>
+                    </t:FileAttachment>
+                  </m:Attachments>
+                </m:CreateAttachment>
+            ''',
+        )
+
+        resp = self._DoRequest(soapBody, truncatePrint=True)
+        if 'ErrorImpersonateUserDenied' in resp.text:
+            # try again, the _StreamingBody can be sent more than once
+            resp = self._DoRequest(soapBody, truncatePrint=True)
+
+        matchAttachmentId = RE_ATTACHMENT_ID.search(resp.text)
+        if not resp.ok or matchAttachmentId is None:
+            return None
+
+        matchChangeKey = RE_ROOT_ITEM_CHANGE_KEY.search(resp.text)
+        if matchChangeKey:
+            calItem._data['ChangeKey'] = matchChangeKey.group(1)
+        calItem._data['HasAttachments'] = True
+
+        return _Attachment(matchAttachmentId.group(1), name, self)
+
+
+class _StreamingBody:
+    '''
+    A request body made of str/bytes parts and iterables of bytes (like _Base64FileStream).
+    requests will send it chunk by chunk with a Content-Length header (not chunked transfer-encoding),
+        because it has a len().
+    It can be iterated more than once, so a request can be retried.
+    '''
+
+    def __init__(self, *parts):
+        self._parts = [part.encode() if isinstance(part, str) else part for part in parts]
+
+    def __iter__(self):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield from part
+
+    def __len__(self):
+        return sum(len(part) for part in self._parts)
+
+    def __str__(self):
+        # used by the debug prints, dont include the streamed content
+        return ''.join(
+            part.decode() if isinstance(part, bytes) else str(part) for part in self._parts
+        )
+
+
+class _Base64FileStream:
+    # yields the base64 encoding of a file, a chunk at a time
+    CHUNK_SIZE = 3 * 64 * 1024  # must be a multiple of 3 so the chunks can be encoded independently
+
+    def __init__(self, fileOrPath):
+        self._fileOrPath = fileOrPath
+        if isinstance(fileOrPath, str):
+            self._startPosition = 0
+            self._size = os.path.getsize(fileOrPath)
+        else:
+            if not (hasattr(fileOrPath, 'seekable') and fileOrPath.seekable()):
+                # the size is needed for Content-Length and the file is re-read if the request is retried
+                raise ValueError('AddAttachment needs a path or a seekable file object, got {}'.format(fileOrPath))
+            self._startPosition = fileOrPath.tell()
+            self._size = fileOrPath.seek(0, io.SEEK_END) - self._startPosition
+            fileOrPath.seek(self._startPosition)
+
+    def __iter__(self):
+        if isinstance(self._fileOrPath, str):
+            with open(self._fileOrPath, 'rb') as file:
+                yield from self._IterFile(file)
+        else:
+            self._fileOrPath.seek(self._startPosition)
+            yield from self._IterFile(self._fileOrPath)
+
+    def _IterFile(self, file):
+        while True:
+            # raw/unbuffered files can return less than asked for before the end of the file,
+            # keep reading so that only the last chunk can be a size that isn't a multiple of 3
+            parts = []
+            size = 0
+            while size < self.CHUNK_SIZE:
+                part = file.read(self.CHUNK_SIZE - size)
+                if not part:
+                    break
+                parts.append(part)
+                size += len(part)
+
+            if not parts:
+                break
+            yield b64encode(b''.join(parts))
+            if size < self.CHUNK_SIZE:
+                break
+
+    def __len__(self):
+        return 4 * ((self._size + 2) // 3)
+
+    def __str__(self):
+        return '<{} bytes of base64 from {}>'.format(len(self), self._fileOrPath)
+
+
+class _TrafficRecorder:
+    # writes request/response pairs to a gzipped NDJSON file, see EWS.StartCapture.
+    # Each capture is one gzip member with a sync flush after every record, so a capture is still readable
+    #   (up to the last record) if the process is killed. The file is fsync'd every CAPTURE_FSYNC_INTERVAL seconds
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            with open(path, 'r+b') as file:
+                self._FinishCapture(file)
+
+        self._file = open(path, 'ab')
+        self._compressor = zlib.compressobj(wbits=31)  # 31 = gzip format
+        self._startTime = time.monotonic()
+        self._lastFsyncTime = self._startTime
+
+    @staticmethod
+    def _FinishCapture(file):
+        # a capture that was not stopped ends in a gzip member without a trailer, and anything appended to it
+        #   could not be read. Cuts that member back to its last sync point and closes it with an empty final block
+        memberStart = 0
+        offset = 0
+        decompressor = zlib.decompressobj(wbits=31)
+        while True:
+            data = file.read(64 * 1024)
+            if not data:
+                break
+            offset += len(data)
+
+            while data:
+                try:
+                    decompressor.decompress(data)
+                except zlib.error:
+                    return  # damaged some other way, leave it alone
+                if decompressor.eof:
+                    data = decompressor.unused_data
+                    memberStart = offset - len(data)
+                    decompressor = zlib.decompressobj(wbits=31)
+                else:
+                    data = b''
+
+        if memberStart == offset:
+            return  # every member is complete
+
+        file.seek(memberStart)
+        member = file.read()
+        end = len(member)
+        while True:
+            # a sync flush ends with an empty stored block, 00 00 ff ff
+            end = member.rfind(b'\x00\x00\xff\xff', 0, end)
+            if end == -1:
+                file.truncate(memberStart)  # not even one complete record
+                return
+
+            head = member[:end + 4]
+            try:
+                text = zlib.decompressobj(wbits=31).decompress(head)
+            except zlib.error:
+                text = None
+            if text is not None and text.endswith(b'\n'):
+                tail = b'\x03\x00'  # an empty final block
+                tail += zlib.crc32(text).to_bytes(4, 'little') + (len(text) & 0xffffffff).to_bytes(4, 'little')
+                decompressor = zlib.decompressobj(wbits=31)
+                try:
+                    decompressor.decompress(head + tail)
+                except zlib.error:
+                    pass
+                if decompressor.eof and not decompressor.unused_data:
+                    file.seek(memberStart + len(head))
+                    file.write(tail)
+                    file.truncate()
+                    return
+
+            end += 3  # the 4 bytes matched inside the compressed data, try an earlier one
+
+    @staticmethod
+    def _Scrub(text):
+        # attachments are replaced by zeros of the same size, so they can still be decoded when replayed
+        text = RE_CAPTURE_ATTACHMENT_CONTENT.sub(lambda match: '<t:Content>{}{}</t:Content>'.format(
+            'A' * len(match.group(1).rstrip('=')),
+            '=' * (len(match.group(1)) - len(match.group(1).rstrip('='))),
+        ), text)
+        text = RE_CAPTURE_BEARER.sub('Bearer [scrubbed]', text)
+        text = RE_CAPTURE_SECRET.sub(lambda match: match.group(1) + '[scrubbed]', text)
+        return text
+
+    def Record(self, url, requestBody, resp, elapsed):
+        requestBody = str(requestBody)  # a _StreamingBody is recorded without the streamed content
+        matchOperation = RE_CAPTURE_OPERATION.search(requestBody)
+        line = json.dumps({
+            't': round(time.monotonic() - self._startTime, 3),
+            'operation': matchOperation.group(1) if matchOperation else None,
+            'url': url,
+            'request': self._Scrub(requestBody),
+            'status_code': resp.status_code,
+            'reason': resp.reason,
+            'text': self._Scrub(resp.text),
+            'elapsed': round(elapsed, 4),
+        }) + '\n'
+
+        self._file.write(self._compressor.compress(line.encode('utf-8')) + self._compressor.flush(zlib.Z_SYNC_FLUSH))
+        self._file.flush()
+        if time.monotonic() - self._lastFsyncTime > CAPTURE_FSYNC_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._lastFsyncTime = time.monotonic()
+
+    def Close(self):
+        self._file.write(self._compressor.flush())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def ReadCapture(path):
+    '''
+    Reads an archive made by EWS.StartCapture.
+    A capture that was not stopped (the process was killed) is read up to its last complete record.
+
+    :param path: str
+    :return: generator of dicts, in the order they were recorded
+    '''
+    decompressor = zlib.decompressobj(wbits=31)
+    text = b''
+    with open(path, 'rb') as file:
+        while True:
+            data = file.read(64 * 1024)
+            if not data:
+                break
+
+            while data:
+                text += decompressor.decompress(data)
+                if decompressor.eof:
+                    # the end of one gzip member, the next one (if any) is in unused_data
+                    data = decompressor.unused_data
+                    decompressor = zlib.decompressobj(wbits=31)
+                else:
+                    data = b''
+
+                lines = text.split(b'\n')
+                text = lines.pop()  # an incomplete line, or b''
+                for line in lines:
+                    if line:
+                        yield json.loads(line.decode('utf-8'))
+
+
+class _ReplayResponse:
+    # looks enough like a requests.Response for _DoRequest and the parsers
+    def __init__(self, record):
+        self.status_code = record['status_code']
+        self.reason = record['reason']
+        self.text = record['text']
+        self.content = self.text.encode()
+        self.ok = self.status_code < 400
+        self.elapsed = datetime.timedelta(seconds=record['elapsed'])
+
+
+class _ReplaySession:
+    # used in place of a requests.Session, see EWS.StartReplay
+
+    def __init__(self, path, realTiming=True):
+        self.headers = {}
+        self.auth = None
+        self._realTiming = realTiming
+        self._records = {}  # {operation: [record, ...]} in recorded order
+
+        for record in ReadCapture(path):
+            self._records.setdefault(record['operation'], []).append(record)
+        for records in self._records.values():
+            records.reverse()  # so pop() returns them in order
+
+    def request(self, method, url, data=None, verify=True, **kwargs):
+        matchOperation = RE_CAPTURE_OPERATION.search(str(data))
+        operation = matchOperation.group(1) if matchOperation else None
+
+        if not self._records.get(operation):
+            raise EOFError('No more recorded responses for operation "{}"'.format(operation))
+        record = self._records[operation].pop()
+
+        if data is not None and not isinstance(data, str):
+            for _ in data:
+                pass  # consume streamed bodies like a real request would
+
+        if self._realTiming:
+            time.sleep(record['elapsed'])
+        return _ReplayResponse(record)
+
+
+def _ExportCalendarData(fileObj, sources, fmt='ics', includeBody=False):
+    '''
+    Writes events to fileObj one at a time.
+
+    :param fileObj: file-like object opened in text mode
+    :param sources: iterable of (roomEmail, iterable of (startDT, endDT, data) tuples)
+    :param fmt: str, "ics" or "ndjson"
+    :param includeBody: bool
+    :return: int, the number of events written
+    '''
+    if fmt not in ('ics', 'ndjson'):
+        raise ValueError('Unknown export format "{}". Use "ics" or "ndjson"'.format(fmt))
+
+    count = 0
+    if fmt == 'ics':
+        fileObj.write('BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//gs_exchange_interface//EN\r\n')
+        stamp = datetime.datetime.utcnow().strftime(ICS_DT_FORMAT) + 'Z'
+
+    for roomEmail, events in sources:
+        for startDT, endDT, data in events:
+            if fmt == 'ics':
+                lines = [
+                    'BEGIN:VEVENT',
+                    'UID:' + data['ItemId'],
+                    'DTSTAMP:' + stamp,
+                    'DTSTART:' + startDT.strftime(ICS_DT_FORMAT),
+                    'DTEND:' + endDT.strftime(ICS_DT_FORMAT),
+                    'SUMMARY:' + _EscapeICSText(_UnescapeXML(data['Subject'])),
+                    'ORGANIZER;CN="{}":invalid:nomail'.format(_UnescapeXML(data['OrganizerName']).replace('"', "'")),
+                ]
+                if roomEmail:
+                    lines.append('LOCATION:' + _EscapeICSText(roomEmail))
+                if includeBody and data.get('Body'):
+                    lines.append('X-ALT-DESC;FMTTYPE=text/html:' + _EscapeICSText(_UnescapeXML(data['Body'])))
+                lines.append('END:VEVENT')
+                fileObj.write(''.join(_FoldICSLine(line) + '\r\n' for line in lines))
+
+            else:
+                obj = {
+                    'Room': roomEmail,
+                    'ItemId': data['ItemId'],
+                    'ChangeKey': data['ChangeKey'],
+                    'Subject': _UnescapeXML(data['Subject']),
+                    'OrganizerName': _UnescapeXML(data['OrganizerName']),
+                    'Start': startDT.isoformat(),
+                    'End': endDT.isoformat(),
+                    'HasAttachments': data['HasAttachments'],
+                }
+                if includeBody:
+                    obj['Body'] = _UnescapeXML(data['Body']) if data.get('Body') else None
+                fileObj.write(json.dumps(obj) + '\n')
+
+            count += 1
+
+    if fmt == 'ics':
+        fileObj.write('END:VCALENDAR\r\n')
+
+    return count
+
+
+def _EscapeXML(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+
+def _UnescapeXML(text):
+    return text.replace('&lt;', '<').replace('&gt;', '>').replace('&quot;', '"').replace('&apos;', "'").replace(
+        '&amp;', '&')
+
+
+def _EscapeICSText(text):
+    # RFC 5545 3.3.11
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _FoldICSLine(line, limit=75):
+    # RFC 5545 3.1, lines are limited to 75 octets, continuation lines start with a single space
+    if len(line.encode()) <= limit:
+        return line
+
+    parts = []
+    current = ''
+    currentSize = 0
+    for char in line:
+        charSize = len(char.encode())
+        if currentSize + charSize > limit:
+            parts.append(current)
+            current = ' '
+            currentSize = 1
+        current += char
+        currentSize += charSize
+    parts.append(current)
+    return '\r\n'.join(parts)
+
 
 class _Attachment:
     def __init__(self, AttachmentId, name, parentExchange):
@@ -627,6 +1826,7 @@ class ServiceAccount(_ServiceAccountBase):
         self.email = email
         self.password = password
         self.authManager = authManager
+        self._user = None  # see _GetAccessToken
 
         assert (self.clientID and self.tenantID and self.oauthID and self.authManager) or (self.email and self.password), str(self)
 
@@ -638,7 +1838,7 @@ class ServiceAccount(_ServiceAccountBase):
             'oauthID': sa.oauthID,
             'email': sa.email,
             'password': sa.password,
-            'authManager': 'devices.authManager',  # todo, generalize this
+            'authManager': 'devices.authManager' if sa.authManager else None,  # todo, generalize this
         })
 
     @classmethod
@@ -650,21 +1850,36 @@ class ServiceAccount(_ServiceAccountBase):
             import devices
             authManager = devices.authManager
 
-        print('653 authManager=', authManager)
-        print('654 d=', d)
-
-        ret = cls(
+        return cls(
             authManager=authManager,
             **d,
         )
-        print('EWS.ServiceAccount.Loader return', ret)
+
+    @classmethod
+    def LoadRoomInterfaces(cls, items, **kwargs):
+        '''
+        Restores many room interfaces at once, for example from persistent storage after a reboot.
+        Nothing is sent over the network and no sessions are created until each EWS makes its first request.
+        Identical ServiceAccount strings are only loaded once.
+
+        :param items: iterable of (serviceAccountString, roomEmail) tuples, serviceAccountString is from ServiceAccount.Dumper
+        :param kwargs: passed to EWS
+        :return: dict like {roomEmail: EWS}
+        '''
+        serviceAccounts = {}
+        ret = {}
+        for serviceAccountString, roomEmail in items:
+            sa = serviceAccounts.get(serviceAccountString)
+            if sa is None:
+                sa = serviceAccounts[serviceAccountString] = cls.Loader(serviceAccountString)
+            ret[roomEmail] = sa._CreateRoomInterface(roomEmail, **kwargs)
         return ret
 
     def __str__(self):
         return '<EWS ServiceAccount: clientID={}, tenantID={}, oauthID={}, authManager={}, email={}, password={}>'.format(
-            self.clientID[:10] + '...',
-            self.tenantID[:10] + '...',
-            self.oauthID[:10] + '...',
+            (self.clientID or '')[:10] + '...',
+            (self.tenantID or '')[:10] + '...',
+            (self.oauthID or '')[:10] + '...',
             self.authManager,
             self.email,
             len(self.password) * '*' if self.password else '***',
@@ -699,6 +1914,30 @@ class ServiceAccount(_ServiceAccountBase):
     def GetType(self):
         return 'Microsoft'
 
+    def ExportCalendars(self, roomEmails, fileObj, startDT, endDT, fmt='ics', includeBody=False, **kwargs):
+        '''
+        Same as EWS.ExportCalendar, but for several rooms written into one file.
+        The room interfaces are created one at a time, as each room is exported.
+
+        :param roomEmails: iterable of str
+        :param fileObj: file-like object opened in text mode
+        :param startDT: datetime
+        :param endDT: datetime
+        :param fmt: str, "ics" or "ndjson"
+        :param includeBody: bool
+        :param kwargs: passed to EWS.IterCalendarRange
+        :return: int, the number of events written
+        '''
+
+        def IterSources():
+            for roomEmail in roomEmails:
+                ews = self.GetRoomInterface(roomEmail)
+                if ews is None:
+                    continue
+                yield roomEmail, ews.IterCalendarRange(startDT, endDT, **kwargs)
+
+        return _ExportCalendarData(fileObj, IterSources(), fmt=fmt, includeBody=includeBody)
+
     def GetRoomInterface(self, roomEmail, **kwargs):
         # print('EWS SA.GetRoomInterface(', roomEmail, kwargs)
         if self.oauthID:
@@ -713,9 +1952,15 @@ class ServiceAccount(_ServiceAccountBase):
                 #         self.oauthID
                 #     ))
                 return
+            self._user = user
+
+        return self._CreateRoomInterface(roomEmail, **kwargs)
 
+    def _CreateRoomInterface(self, roomEmail, **kwargs):
+        # does not check the authManager, the oauth user is looked up when the first token is needed
+        if self.oauthID:
             ews = EWS(
-                oauthCallback=user.GetAccessToken,
+                oauthCallback=self._GetAccessToken,
                 impersonation=roomEmail,
                 **kwargs
             )
@@ -725,10 +1970,431 @@ class ServiceAccount(_ServiceAccountBase):
             ews = EWS(
                 username=self.email,
                 password=self.password,
-                impersonation=roomEmail
+                impersonation=roomEmail,
+                **kwargs
             )
             return ews
 
+    def _GetAccessToken(self):
+        if self._user is None:
+            self._user = self.authManager.GetUserByID(self.oauthID)
+        if self._user is None:
+            return None  # the request will fail and the EWS will be "Disconnected"
+        return self._user.GetAccessToken()
+
+
+def _CalendarItemToDict(calItem):
+    # _CalendarItem holds a reference to its parent EWS, so only send plain data between processes
+    return {
+        key: calItem.Get(key) for key in (
+            'ItemId',
+            'ChangeKey',
+            'Subject',
+            'OrganizerName',
+            'HasAttachments',
+            'Start',
+            'End',
+        )
+    }
+
+
+class _HashRing:
+    '''
+    Consistent hash ring. Each node is placed on the ring "replicas" times,
+    so adding or removing a node only moves about 1/N of the keys.
+    '''
+
+    def __init__(self, nodes=(), replicas=100):
+        self._replicas = replicas
+        self._hashes = []  # sorted
+        self._nodeByHash = {}
+        for node in nodes:
+            self.AddNode(node)
+
+    @staticmethod
+    def _Hash(key):
+        return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+    def AddNode(self, node):
+        for i in range(self._replicas):
+            h = self._Hash('{}#{}'.format(node, i))
+            if h not in self._nodeByHash:
+                bisect.insort(self._hashes, h)
+            self._nodeByHash[h] = node
+
+    def RemoveNode(self, node):
+        for i in range(self._replicas):
+            h = self._Hash('{}#{}'.format(node, i))
+            if self._nodeByHash.get(h) == node:
+                self._nodeByHash.pop(h)
+                self._hashes.remove(h)
+
+    def GetNode(self, key):
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, self._Hash(key)) % len(self._hashes)
+        return self._nodeByHash[self._hashes[index]]
+
+
+def _FleetWorker(name, serviceAccountString, roomEmails, controlQueue, eventQueue, pollInterval, roomInterfaceKwargs):
+    # runs in a child process, polls its rooms and sends the calendar/connection events back to the Fleet
+    import queue
+
+    sa = ServiceAccount.Loader(serviceAccountString)
+    interfaces = {}
+    synced = {}  # {roomEmail: EWS} the interfaces that have sent their '_Synced' event, see Fleet._ReconcileRoom
+
+    def HookEvents(roomEmail, ews):
+        def Send(event, data):
+            eventQueue.put((name, roomEmail, event, data))
+
+        ews.NewCalendarItem = lambda _, item: Send('NewCalendarItem', _CalendarItemToDict(item))
+        ews.CalendarItemChanged = lambda _, item: Send('CalendarItemChanged', _CalendarItemToDict(item))
+        ews.CalendarItemDeleted = lambda _, item: Send('CalendarItemDeleted', _CalendarItemToDict(item))
+        ews.Connected = lambda _, state: Send('Connected', state)
+        ews.Disconnected = lambda _, state: Send('Disconnected', state)
+
+    def SetRooms(newRoomEmails):
+        for roomEmail in set(interfaces) - set(newRoomEmails):
+            interfaces.pop(roomEmail)
+            synced.pop(roomEmail, None)
+        for roomEmail in newRoomEmails:
+            if roomEmail not in interfaces:
+                ews = sa.GetRoomInterface(roomEmail, **roomInterfaceKwargs)
+                if ews is None:
+                    eventQueue.put((name, roomEmail, 'Error', 'Could not create room interface'))
+                    continue
+                HookEvents(roomEmail, ews)
+                interfaces[roomEmail] = ews
+
+    def HandleControl(msg):
+        # returns False when the worker should exit
+        cmd, arg = msg
+        if cmd == 'rooms':
+            SetRooms(arg)
+        elif cmd == 'stop':
+            return False
+        return True
+
+    SetRooms(roomEmails)
+    while True:
+        deadline = time.monotonic() + pollInterval
+
+        for roomEmail, ews in list(interfaces.items()):
+            if roomEmail not in interfaces:
+                continue  # removed by a control message during this pass
+            try:
+                if synced.get(roomEmail) is ews:
+                    ews.UpdateCalendar()
+                else:
+                    # first poll of a room that is new to this worker. Tell the Fleet which items are in the window,
+                    #   so it can report the ones that were deleted while the room had no worker
+                    startDT = datetime.datetime.now().replace(second=0, microsecond=0) - datetime.timedelta(days=1)
+                    endDT = datetime.datetime.now() + datetime.timedelta(days=7)
+                    resp = ews.UpdateCalendar(startDT=startDT, endDT=endDT)
+                    if resp.ok:
+                        if 'IncludesLastItemInRange="false"' not in resp.text:  # cant tell what is missing otherwise
+                            eventQueue.put((name, roomEmail, '_Synced', {
+                                'Start': startDT,
+                                'End': endDT,
+                                'ItemIds': [itemId for itemId, changeKey in ews._calItemCache],
+                            }))
+                        synced[roomEmail] = ews
+            except Exception as e:
+                eventQueue.put((name, roomEmail, 'Error', str(e)))
+
+            while True:
+                try:
+                    msg = controlQueue.get_nowait()
+                except queue.Empty:
+                    break
+                if not HandleControl(msg):
+                    return
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                msg = controlQueue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if not HandleControl(msg):
+                return
+
+
+class Fleet:
+    '''
+    Polls many rooms using several worker processes.
+    Rooms are assigned to workers by consistent hashing, so adding/removing a worker only moves a fraction of the rooms.
+    Each worker creates its EWS instances with ServiceAccount.GetRoomInterface.
+    Calendar and connection events are sent back to this process over a multiprocessing.Queue,
+        and are dispatched to the callbacks when you call Poll().
+
+    Callbacks take 2 args: (roomEmail, data)
+        data is a dict for NewCalendarItem/CalendarItemChanged/CalendarItemDeleted
+        and a str for Connected/Disconnected/Error
+
+    Example:
+        fleet = Fleet(sa, roomEmails=['room1@company.com', 'room2@company.com'], numWorkers=4)
+        fleet.NewCalendarItem = lambda room, item: print('NewCalendarItem', room, item)
+        fleet.Start()
+        while True:
+            fleet.Poll(timeout=1)
+    '''
+
+    def __init__(
+            self,
+            serviceAccount,
+            roomEmails=(),
+            numWorkers=None,
+            pollInterval=60,
+            replicas=100,
+            roomInterfaceKwargs=None,
+            debug=False,
+    ):
+        import multiprocessing
+
+        self._serviceAccountString = ServiceAccount.Dumper(serviceAccount)
+        self._roomEmails = set(roomEmails)
+        self._pollInterval = pollInterval
+        self._roomInterfaceKwargs = roomInterfaceKwargs or {}
+        self._debug = debug
+
+        self._ring = _HashRing(replicas=replicas)
+        self._workers = {}  # name: {'process': Process, 'controlQueue': Queue, 'rooms': list}
+        self._workerCount = 0
+        self._eventQueue = multiprocessing.Queue()
+        self._running = False
+
+        self.ConnectionStatus = {}  # roomEmail: 'Connected'/'Disconnected'
+
+        # {roomEmail: {ItemId: item dict}}, the items that have already been announced.
+        # When a room moves to another worker, that worker's new EWS reports every booking as new again,
+        #   these are used to drop the repeats in Poll, and to report the items deleted during the move
+        self._knownItems = {}
+        self._lastPruneTime = time.monotonic()
+
+        self.NewCalendarItem = None
+        self.CalendarItemChanged = None
+        self.CalendarItemDeleted = None
+        self.Connected = None
+        self.Disconnected = None
+        self.Error = None
+
+        for _ in range(numWorkers or multiprocessing.cpu_count()):
+            self._AddWorkerName()
+
+    def print(self, *a, **k):
+        if self._debug:
+            print(*a, **k)
+
+    def __str__(self):
+        return '<Fleet: workers={}, rooms={}, running={}>'.format(
+            len(self._workers),
+            len(self._roomEmails),
+            self._running,
+        )
+
+    def _AddWorkerName(self):
+        name = 'worker{}'.format(self._workerCount)
+        self._workerCount += 1
+        self._ring.AddNode(name)
+        self._workers[name] = {'process': None, 'controlQueue': None, 'rooms': []}
+        return name
+
+    def GetAssignments(self):
+        '''
+        :return: dict like {workerName: [roomEmail, ...]}
+        '''
+        ret = {name: [] for name in self._workers}
+        for roomEmail in sorted(self._roomEmails):
+            ret[self._ring.GetNode(roomEmail.lower())].append(roomEmail)
+        return ret
+
+    def _StartWorker(self, name):
+        import multiprocessing
+
+        worker = self._workers[name]
+        worker['controlQueue'] = multiprocessing.Queue()
+        worker['process'] = multiprocessing.Process(
+            target=_FleetWorker,
+            args=(
+                name,
+                self._serviceAccountString,
+                worker['rooms'],
+                worker['controlQueue'],
+                self._eventQueue,
+                self._pollInterval,
+                self._roomInterfaceKwargs,
+            ),
+            name='gs_exchange_interface.Fleet.{}'.format(name),
+            daemon=True,
+        )
+        worker['process'].start()
+        self.print('Fleet started', name, worker['rooms'])
+
+    def _StopWorker(self, name):
+        worker = self._workers[name]
+        if worker['process'] is not None:
+            worker['controlQueue'].put(('stop', None))
+            worker['process'].join(timeout=self._pollInterval)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+            worker['process'] = None
+            worker['controlQueue'] = None
+
+    def _Rebalance(self):
+        # sends the new room list to each worker whose assignment changed
+        for name, rooms in self.GetAssignments().items():
+            worker = self._workers[name]
+            if rooms != worker['rooms']:
+                self.print('Fleet reassign', name, worker['rooms'], '>', rooms)
+                worker['rooms'] = rooms
+                if self._running:
+                    worker['controlQueue'].put(('rooms', rooms))
+
+    def Start(self):
+        if self._running:
+            return
+        self._Rebalance()
+        for name in self._workers:
+            self._StartWorker(name)
+        self._running = True
+
+    def Stop(self):
+        for name in self._workers:
+            self._StopWorker(name)
+        self._running = False
+
+    def AddWorker(self):
+        '''
+        :return: str, the name of the new worker
+        '''
+        name = self._AddWorkerName()
+        if self._running:
+            self._StartWorker(name)
+        self._Rebalance()
+        return name
+
+    def RemoveWorker(self, name):
+        self._ring.RemoveNode(name)
+        self._StopWorker(name)
+        self._workers.pop(name)
+        self._Rebalance()
+
+    def AddRoom(self, roomEmail):
+        self._roomEmails.add(roomEmail)
+        self._Rebalance()
+
+    def RemoveRoom(self, roomEmail):
+        self._roomEmails.discard(roomEmail)
+        self.ConnectionStatus.pop(roomEmail, None)
+        self._knownItems.pop(roomEmail, None)
+        self._Rebalance()
+
+    def _FilterCalendarEvent(self, roomEmail, event, item):
+        '''
+        Keeps _knownItems up to date and drops NewCalendarItem events for items that were already announced.
+
+        :return: str, the event to dispatch (a re-announced item with a new ChangeKey becomes CalendarItemChanged),
+            or None to drop it
+        '''
+        knownItems = self._knownItems.setdefault(roomEmail, {})
+        known = knownItems.get(item['ItemId'])
+
+        if event == 'CalendarItemDeleted':
+            knownItems.pop(item['ItemId'], None)
+            return event
+
+        knownItems[item['ItemId']] = item
+        if event == 'NewCalendarItem' and known is not None:
+            if known['ChangeKey'] == item['ChangeKey']:
+                return None
+            return 'CalendarItemChanged'
+        return event
+
+    def _ReconcileRoom(self, roomEmail, data):
+        '''
+        Handles the '_Synced' event a worker sends after its first poll of a room.
+        Known items in the polled window that the worker did not find were deleted while the room was moving,
+            and no EWS is left that knows about them, so the deletes are reported here.
+
+        :param data: dict like {'Start': datetime, 'End': datetime, 'ItemIds': [str, ...]}
+        :return: list of item dicts that were deleted
+        '''
+        knownItems = self._knownItems.get(roomEmail, {})
+        found = set(data['ItemIds'])
+        ret = []
+        for itemId, item in list(knownItems.items()):
+            if itemId in found or item['Start'] is None or item['End'] is None:
+                continue
+            if item['Start'] < data['End'] and item['End'] > data['Start']:
+                knownItems.pop(itemId)
+                ret.append(item)
+        return ret
+
+    def _PruneKnownItems(self):
+        # forget items that ended more than a day ago, so _knownItems does not grow forever
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=1)
+        for knownItems in self._knownItems.values():
+            for itemId, item in list(knownItems.items()):
+                if item['End'] is not None and item['End'] < cutoff:
+                    knownItems.pop(itemId)
+
+    def Poll(self, timeout=None):
+        '''
+        Dispatches the events sent by the workers to the callbacks.
+        Workers that have died are restarted.
+
+        :param timeout: float, seconds to wait for the first event. None = wait forever
+        :return: int, the number of events dispatched
+        '''
+        import queue
+
+        if self._running:
+            for name, worker in self._workers.items():
+                if worker['process'] is not None and not worker['process'].is_alive():
+                    self.print('Fleet restarting', name, 'exitcode=', worker['process'].exitcode)
+                    self._StartWorker(name)
+
+        if time.monotonic() - self._lastPruneTime > self._pollInterval:
+            self._PruneKnownItems()
+            self._lastPruneTime = time.monotonic()
+
+        count = 0
+        block = True
+        while True:
+            try:
+                name, roomEmail, event, data = self._eventQueue.get(block=block, timeout=timeout if block else None)
+            except queue.Empty:
+                break
+            block = False
+
+            if roomEmail not in self._roomEmails:
+                continue  # an event sent just before the room was removed
+
+            if event == '_Synced':
+                for item in self._ReconcileRoom(roomEmail, data):
+                    if callable(self.CalendarItemDeleted):
+                        self.CalendarItemDeleted(roomEmail, item)
+                    count += 1
+                continue
+
+            if event in ('Connected', 'Disconnected'):
+                self.ConnectionStatus[roomEmail] = event
+            elif event in ('NewCalendarItem', 'CalendarItemChanged', 'CalendarItemDeleted'):
+                event = self._FilterCalendarEvent(roomEmail, event, data)
+                if event is None:
+                    continue
+
+            callback = getattr(self, event, None)
+            if callable(callback):
+                callback(roomEmail, data)
+            count += 1
+
+        return count
+
 
 if __name__ == '__main__':
     import creds
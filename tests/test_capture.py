@@ -0,0 +1,110 @@
+'''
+Records and replays captures made with EWS.StartCapture.
+
+Usage:
+    python -m unittest discover tests
+'''
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gs_exchange_interface
+
+FIND_ITEM_RESPONSE = '''<m:FindItemResponseMessage ResponseClass="Success">
+    <m:RootFolder TotalItemsInView="1" IncludesLastItemInRange="true">
+        <t:Items>
+            <t:CalendarItem>
+                <t:ItemId Id="AAMkAD{i:08d}" ChangeKey="DwAAAB{i:08d}"/>
+                <t:Subject>Meeting {i}</t:Subject>
+                <t:HasAttachments>false</t:HasAttachments>
+                <t:Start>2026-01-05T08:00:00Z</t:Start>
+                <t:End>2026-01-05T08:30:00Z</t:End>
+                <t:Organizer><t:Mailbox><t:Name>Organizer {i}</t:Name></t:Mailbox></t:Organizer>
+            </t:CalendarItem>
+        </t:Items>
+    </m:RootFolder>
+</m:FindItemResponseMessage>'''
+
+
+class _Response:
+    def __init__(self, text):
+        self.status_code = 200
+        self.reason = 'OK'
+        self.text = text
+        self.ok = True
+
+
+class _Session:
+    # answers every request with the next response in FIND_ITEM_RESPONSE
+    def __init__(self, start):
+        self.headers = {}
+        self.auth = None
+        self.i = start
+
+    def request(self, method, url, data=None, verify=True, **kwargs):
+        self.i += 1
+        return _Response(FIND_ITEM_RESPONSE.format(i=self.i))
+
+
+class TestCapture(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempDir, 'capture.ndjson.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def Capture(self, numRequests, start, stop=True):
+        # returns the list of response texts that were captured
+        ews = gs_exchange_interface.EWS(username='user@example.com', password='password')
+        ews._session = _Session(start)
+        ews.StartCapture(self.path)
+        ret = [ews.UpdateCalendar().text for _ in range(numRequests)]
+        if stop:
+            ews.StopCapture()
+        else:
+            ews._recorder._file.close()  # like the process was killed
+        return ret
+
+    def Replay(self, numRequests):
+        ews = gs_exchange_interface.EWS(username='user@example.com', password='password')
+        ews.StartReplay(self.path, realTiming=False)
+        ret = [ews.UpdateCalendar().text for _ in range(numRequests)]
+        with self.assertRaises(EOFError):
+            ews.UpdateCalendar()
+        return ret
+
+    def test_record_replay(self):
+        texts = self.Capture(3, start=0)
+        self.assertEqual([record['text'] for record in gs_exchange_interface.ReadCapture(self.path)], texts)
+        self.assertEqual(self.Replay(3), texts)
+
+    def test_append(self):
+        texts = self.Capture(2, start=0)
+        texts += self.Capture(2, start=10)
+        self.assertEqual(self.Replay(4), texts)
+
+    def test_crash_then_append(self):
+        texts = self.Capture(2, start=0, stop=False)
+        texts += self.Capture(2, start=10)
+        self.assertEqual(self.Replay(4), texts)
+
+    def test_crash_mid_record_then_append(self):
+        texts = self.Capture(3, start=0, stop=False)
+        with open(self.path, 'r+b') as file:
+            file.truncate(os.path.getsize(self.path) - 20)  # the last record was only partly written
+        texts = texts[:2] + self.Capture(2, start=10)
+        self.assertEqual(self.Replay(4), texts)
+
+        # the file is a normal gzip file again
+        with gzip.open(self.path, 'rt') as file:
+            self.assertEqual(len(file.read().splitlines()), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()